@@ -9,8 +9,8 @@ cmd=("python3 wm.py -h"
      "python3 wm.py install 1293845868"
      "python3 wm.py list"
 )
-rm -rf params.pkl
-rm -rf mods.pkl
+rm -rf params.pkl params.json
+rm -rf mods.pkl mods.json
 
 for c in "${cmd[@]}"
 do
@@ -0,0 +1,135 @@
+import unittest
+
+from wm import Appworkshop, SteamWorkshop
+
+
+FILEDETAILS_HTML = b"""<html><head><title>Steam Workshop</title></head><body>
+<a href="https://steamcommunity.com/sharedfiles/filedetails/?id=1293845868&searchtext=">Item</a>
+<div id="mainContents">
+  <div class="workshopItemTitle">Altitude \xc3\x84 Map</div>
+  <img id="previewImageMain" src="https://images.example/main.jpg">
+  <div id="RequiredItems">
+    <a href="https://steamcommunity.com/workshop/filedetails/?id=450814997" target="_blank">
+      <div class="requiredItem">CBA_A3</div>
+    </a>
+    <a href="https://steamcommunity.com/workshop/filedetails/?id=463939057" target="_blank">
+      <div class="requiredItem">ace</div>
+    </a>
+  </div>
+  <div class="detailsStatsContainerRight">
+    <div class="detailsStatRight">1,234.5 MB</div>
+    <div class="detailsStatRight">12 Oct @ 3:14pm</div>
+  </div>
+</div>
+</body></html>"""
+
+MISSING_HTML = b"""<html><body>
+<div id="message">
+  <h3>There was a problem accessing the item.  Please try again.</h3>
+</div>
+</body></html>"""
+
+ACF = """"AppWorkshop"
+{
+	"appid"		"440"
+	"SizeOnDisk"		"1294336"
+	"WorkshopItemsInstalled"
+	{
+		"1293845868"
+		{
+			"size"		"1294336"
+			"timeupdated"		"1516221339"
+			"manifest"		"3407135155186596528"
+		}
+		"450814997"
+		{
+		}
+	}
+	"WorkshopItemDetails"
+	{
+	}
+	"SizeOnDisk"		"2588672"
+}
+"""
+
+
+def parse_acf_recursive(content):
+    """The recursive parser replaced by Appworkshop._parse_acf, kept as reference"""
+    result = {}
+    nested = ""
+    collect_nested_dict = False
+    nested_count = 0
+    last = ""
+
+    for line in content.splitlines():
+        line = line.strip().replace("\"", "")
+        if collect_nested_dict:
+            nested += line + "\n"
+            if "{" in line:
+                nested_count += 1
+            if "}" in line:
+                nested_count -= 1
+            if nested_count < 0:
+                result[last] = parse_acf_recursive(nested)
+                nested = ""
+                nested_count = 0
+                collect_nested_dict = False
+            continue
+        if "{" in line:
+            collect_nested_dict = True
+            continue
+
+        if "\t\t" in line:
+            vars = line.split("\t\t")
+            result[vars[0]] = vars[1]
+
+        last = line
+    return result
+
+
+class ParseFiledetailsTest(unittest.TestCase):
+    parse = staticmethod(SteamWorkshop._SteamWorkshop__parse_filedetails)
+
+    def test_item(self):
+        self.assertEqual(self.parse(FILEDETAILS_HTML),
+                         {"id": "1293845868",
+                          "name": "Altitude Ä Map",
+                          "logo_url": "https://images.example/main.jpg",
+                          "require": ["450814997", "463939057"],
+                          "size": int(1234.5 * 1024**2)})
+
+    def test_preview_image_wins_over_main_image(self):
+        html = FILEDETAILS_HTML.replace(b'<img id="previewImageMain" src="https://images.example/main.jpg">',
+                                        b'<img id="previewImageMain" src="https://images.example/main.jpg">'
+                                        b'<img id="previewImage" src="https://images.example/preview.jpg">')
+        self.assertEqual(self.parse(html)["logo_url"], "https://images.example/preview.jpg")
+
+    def test_without_required_items(self):
+        start = FILEDETAILS_HTML.index(b'<div id="RequiredItems">')
+        end = FILEDETAILS_HTML.index(b'<div class="detailsStatsContainerRight">')
+        html = FILEDETAILS_HTML[:start] + FILEDETAILS_HTML[end:]
+        self.assertEqual(self.parse(html)["require"], [])
+
+    def test_message(self):
+        self.assertEqual(self.parse(MISSING_HTML),
+                         {"message": "There was a problem accessing the item.  Please try again."})
+
+
+class ParseAcfTest(unittest.TestCase):
+    def test_sample(self):
+        self.assertEqual(Appworkshop._parse_acf(ACF),
+                         {"AppWorkshop": {"appid": "440",
+                                          "SizeOnDisk": "2588672",
+                                          "WorkshopItemsInstalled": {
+                                              "1293845868": {"size": "1294336",
+                                                             "timeupdated": "1516221339",
+                                                             "manifest": "3407135155186596528"},
+                                              "450814997": {}},
+                                          "WorkshopItemDetails": {}}})
+
+    def test_matches_recursive_parser(self):
+        self.assertEqual(Appworkshop._parse_acf(ACF), parse_acf_recursive(ACF))
+
+
+if __name__ == "__main__":
+    unittest.main()
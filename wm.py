@@ -1,85 +1,189 @@
 from argparse import ArgumentParser as ArgParser
-from joblib import Parallel, delayed
-import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import json
 import pickle as pkl
-import urllib.parse   # https://docs.python.org/3/library/urllib.request.html#module-urllib.request
-import urllib.request
-import urllib.error
+from lxml import etree, html as lxml_html  # https://lxml.de/lxmlhtml.html
+import requests   # https://requests.readthedocs.io/en/latest/user/advanced/#session-objects
+from requests.adapters import HTTPAdapter
 import re
 import subprocess
 import pathlib
 import glob
 import os
+import sys
+import tempfile
+import threading
+import time
+
+_FILEDETAILS_ID_RE = re.compile(r"filedetails/\?id=(\d{5,15})")
+_FILEDETAILS_ID_BYTES_RE = re.compile(_FILEDETAILS_ID_RE.pattern.encode())   # same pattern for raw page bytes
+_UNIT_BYTES = {"": 1, "kb": 1024, "mb": 1024**2, "gb": 1024**3, "tb": 1024**4}
+_MB = _UNIT_BYTES["mb"]
+_MAX_AGE = 24 * 60 * 60   # seconds until stored workshop information is read again
+_STORE_LOCK = threading.Lock()   # mods are written back from several crawler threads
+
+# XPath expressions of the workshop item page, compiled once instead of on every parsed page
+_XP_MESSAGE = etree.XPath('//*[@id="message"]')
+_XP_LINK = etree.XPath('//*[contains(@href, "filedetails/?id")]/@href')
+_XP_CONTENTS = etree.XPath('//*[@id="mainContents"]')
+_XP_TITLE = etree.XPath('string(.//div[contains(@class, "workshopItemTitle")])')
+_XP_PREVIEW = etree.XPath('.//*[@id=$image]/@src')
+_XP_REQUIRED = etree.XPath('.//*[@id="RequiredItems"]//a/@href')
+_XP_SIZE = etree.XPath('string(.//div[contains(@class, "detailsStatRight")])')
+
 
 class Mod:
-    def __init__(self, id):
+    def __init__(self, id, details=None):
         """Holds all information about one specific mod.
 
-        This class is used to provide functionality and information via CLI
+        This class is used to provide functionality and information via CLI.
+        If details are given, the workshop page is not read again
+        and dependencies are only resolved once they are requested.
 
         :param id: Workshop ID
+        :param details: dictionary of mod information from SteamWorkshop.details (default None)
         """
         self.id = id
         self.name = ""
         self.logo_url = ""
         self.require = []
         self.size = 0
+        self.fetched_at = 0
+        if details is not None:
+            self.set_details(details)
+            return
         self.update()
 
         self.dependencies = self.update_dependencies()
 
+    @classmethod
+    def fetch_many(cls, ids):
+        """Creates mods for a list of Workshop IDs, reading their workshop pages concurrently
+
+        :param ids: list of Workshop IDs
+        :return: list of Mod in the order of ids
+        """
+        return [cls(i, d) for i, d in zip(ids, SteamWorkshop.details_many(ids))]
+
+    @classmethod
+    def load_or_fetch(cls, id, max_age=_MAX_AGE, force=False):
+        """Provides an installed mod without reading the workshop page, as long as its information is fresh
+
+        Information read again for an installed mod is stored, so it is fresh for the next run.
+
+        :param id: Workshop ID
+        :param max_age: seconds after which stored information is read again (default one day)
+        :param force: read the workshop page even if the stored information is fresh (default False)
+        :return: Mod
+        """
+        mod = None if force else cls.__stored(id, max_age)
+        if mod is not None:
+            return mod
+        mod = cls(id)
+        cls.__store_fresh([mod])
+        return mod
+
+    @classmethod
+    def load_or_fetch_many(cls, ids, max_age=_MAX_AGE):
+        """Provides mods for a list of Workshop IDs, only reading the workshop pages of mods without fresh information
+
+        Information read again for installed mods is stored in one write, so it is fresh for the next run.
+
+        :param ids: list of Workshop IDs
+        :param max_age: seconds after which stored information is read again (default one day)
+        :return: list of Mod in the order of ids
+        """
+        stored = {}
+        for i in ids:
+            mod = cls.__stored(i, max_age)
+            if mod is not None:
+                stored[i] = mod
+        fetched = cls.fetch_many([i for i in ids if i not in stored])
+        cls.__store_fresh(fetched)
+        fetched = iter(fetched)
+        return [stored[i] if i in stored else next(fetched) for i in ids]
+
+    @staticmethod
+    def __stored(id, max_age):
+        mod = Mods.instance().get(id)
+        # mods stored by older versions carry no timestamp
+        if mod is not None and time.time() - getattr(mod, "fetched_at", 0) <= max_age:
+            return mod
+        return None
+
+    @staticmethod
+    def __store_fresh(mods):
+        # only installed mods whose workshop page was read successfully replace the stored ones
+        with _STORE_LOCK, Mods.instance() as db:
+            for mod in mods:
+                old = db.get(mod.id)
+                if old is None or mod.fetched_at == 0:
+                    continue
+                if not hasattr(mod, 'dependencies'):
+                    # the dependency tree is only crawled again once the required items have changed
+                    if hasattr(old, 'dependencies') and old.require == mod.require:
+                        mod.dependencies = old.dependencies
+                    else:
+                        mod.get_dependencies()
+                db.install(mod)
+
     def __str__(self) -> str:
-        result = "{: >12}: {}\n".format("id", self.id)
-        result += "{: >12}: {}\n".format("name", self.name)
-        result += "{: >12}: {}\n".format("logo_url", self.logo_url)
-        result += "{: >12}: {}\n".format("size", self.str_get_size())
-        result += "{: >12}: [\n".format("require", "")
-        for mod in self.require:
-            result += "{:14} {:10} {},\n".format("", mod.id, mod.name)
-        result += "{:12}  ]".format("")
-        return result
+        result = ["{: >12}: {}".format("id", self.id),
+                  "{: >12}: {}".format("name", self.name),
+                  "{: >12}: {}".format("logo_url", self.logo_url),
+                  "{: >12}: {}".format("size", self.str_get_size()),
+                  "{: >12}: [".format("require", "")]
+        for mod in Mod.load_or_fetch_many(self.require):
+            result.append("{:14} {:10} {},".format("", mod.id, mod.name))
+        result.append("{:12}  ]".format(""))
+        return "\n".join(result)
 
     def __eq__(self, other):
         return type(other) == Mod and self.id == other.id
 
+    def __hash__(self):
+        return hash(self.id)
+
     def update(self):
-        """Refreshes all information by reading the workshop page again
+        """Refreshes all information from the workshop page
+
+        The page is only read once per run, see SteamWorkshop.details
+
+        :return: None
+        """
+        self.set_details(SteamWorkshop.details(self.id))
+
+    def set_details(self, new):
+        """Sets all information from crawled workshop item information
 
+        :param new: dictionary of mod information from SteamWorkshop.details
         :return: None
         """
-        new = SteamWorkshop.details(self.id)
         if "message" in new.keys():
             print("Mod", self.id, "was not found!")
             return
 
         self.name = new["name"]
         self.logo_url = new["logo_url"]
-        self.require.clear()
-        for m in new["require"]:
-            self.require += [m]
+        self.require = list(new["require"])
         self.set_size(new["size"])
+        self.fetched_at = time.time()
 
-    def set_size(self, string):
-        """Reads workshop item size from human readable string and sets fields accordingly
+    def set_size(self, size):
+        """Sets workshop item size
 
-        :param string: file size
+        :param size: file size in bytes
         :return: None
         """
-        suffix = ["", "kb", "mb", "gb", "tb"]
-        string = string.split(" ")
-        assert len(string) == 2
-
-        bytes = pow(1024, suffix.index(string[1].lower()))
-        bytes *= float(string[0].replace(",", ""))
-
-        self.size = bytes
+        self.size = size
 
     def str_get_size(self):
         """Builds human readable file size from bytes
 
         :return: human readable file size
         """
-        mb = self.size/pow(1024, 2)
+        mb = self.size/_MB
         return "{:.2f} MB".format(mb)
 
     def str_one_line(self) -> str:
@@ -97,22 +201,76 @@ class Mod:
     def update_dependencies(self):
         return SteamWorkshop.get_dependencies(self.id)
 
+    def to_dict(self):
+        """Provides all information as plain dictionary for storing the mod
+
+        :return: dictionary of mod information, see also from_dict
+        """
+        result = {"id": self.id, "name": self.name, "logo_url": self.logo_url,
+                  "require": self.require, "size": self.size, "fetched_at": getattr(self, "fetched_at", 0)}
+        if hasattr(self, 'dependencies'):
+            result["dependencies"] = self.dependencies
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restores a mod from a dictionary created by to_dict without reading the workshop page
+
+        :param data: dictionary of mod information
+        :return: Mod
+        """
+        mod = cls(data["id"], data)
+        mod.fetched_at = data.get("fetched_at", 0)
+        if "dependencies" in data:
+            mod.dependencies = list(data["dependencies"])
+        return mod
 
-class PklDB:
+
+class JsonDB:
+    __instances = {}
 
     def __init__(self, file_name):
-        """Reads dictionaries from <file_name> with Pickle
+        """Reads dictionaries from <file_name> with JSON
 
         This class can be used as a persistent dictionary.
-        It wraps Pickle around one single dictionary.
+        It wraps JSON around one single dictionary.
+        Databases of older versions, stored with Pickle, are still read and converted on the next write.
+        Used as a context manager, all changes are written only once on exit,
+        nested blocks are written when the outermost block exits.
 
-        :param file_name: name of Pickle file
+        :param file_name: name of JSON file
         :return: None
         """
         self.__data = {}
-        self.file = self.__get_file(file_name)
+        self.__batch = 0
+        self.__changed = False
+        self.file = self.__get_file(file_name, ".json")
         self.__load()
 
+    @classmethod
+    def instance(cls):
+        """Provides one shared instance per subclass
+
+        The JSON file is only read once per process, all changes are written through this instance.
+
+        :return: instance of cls
+        """
+        if cls not in JsonDB.__instances:
+            JsonDB.__instances[cls] = cls()
+        return JsonDB.__instances[cls]
+
+    def __enter__(self):
+        self.__batch += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.__batch -= 1
+        if self.__changed:
+            self.__save()
+
+    def __contains__(self, key):
+        return key in self.__data
+
     def values(self):
         return self.__data.values()
 
@@ -132,14 +290,37 @@ class PklDB:
         self.__save()
         return result
 
+    @staticmethod
+    def _to_json(value):
+        """Converts a stored value to plain JSON data, overwrite for values other than JSON types"""
+        return value
+
+    @staticmethod
+    def _from_json(value):
+        """Converts plain JSON data back to a stored value, the inverse of _to_json"""
+        return value
+
     def __save(self):
-        with open(self.file, 'wb') as f:
-            pkl.dump(self.__data, f)
+        if self.__batch > 0:
+            self.__changed = True
+            return
+        data = {k: self._to_json(v) for k, v in self.__data.items()}
+        with open(self.file, 'w') as f:
+            f.write(json.dumps(data, separators=(",", ":")))
+        self.__changed = False
 
     def __load(self):
         try:
-            with open(self.file, 'rb') as f:
-                self.__data = pkl.load(f)
+            with open(self.file, 'r') as f:
+                data = json.loads(f.read())
+            self.__data = {k: self._from_json(v) for k, v in data.items()}
+        except FileNotFoundError:
+            self.__load_pkl(self.__get_file(self.file, ".pkl"))
+
+    def __load_pkl(self, file):
+        try:
+            with open(file, 'rb') as f:
+                self.__data = pkl.loads(f.read())
 
             # backwards compatibility to list db
             if type(self.__data) == list:
@@ -150,20 +331,28 @@ class PklDB:
         except FileNotFoundError:
             return
 
-    def __get_file(self, file_name):
+    def __get_file(self, file_name, suffix):
         file = pathlib.Path(file_name)
-        file = file.with_suffix(".pkl")
+        file = file.with_suffix(suffix)
         return file
 
 
-class Params(PklDB):
+class Params(JsonDB):
     def __init__(self):
-        PklDB.__init__(self, "params")
+        JsonDB.__init__(self, "params")
 
 
-class Mods(PklDB):
+class Mods(JsonDB):
     def __init__(self):
-        PklDB.__init__(self, "mods")
+        JsonDB.__init__(self, "mods")
+
+    @staticmethod
+    def _to_json(value):
+        return value.to_dict()
+
+    @staticmethod
+    def _from_json(value):
+        return Mod.from_dict(value)
 
     def install(self, mod_id):
         """Takes a string or Mod and adds it to the dictionary
@@ -180,20 +369,62 @@ class Mods(PklDB):
             mod = mod_id
 
         if mod is not None:
-            PklDB.update(self, {mod.id: mod})
+            JsonDB.update(self, {mod.id: mod})
+
+    def install_many(self, mod_ids):
+        """Adds a list of strings or Mods to the dictionary and saves it once
+
+        :param mod_ids: list of Workshop IDs or instances of Mod
+        :return: None
+        """
+        with self:
+            for mod_id in mod_ids:
+                self.install(mod_id)
+
+
+def steam_session(pool_size):
+    """Creates one HTTP session which is shared by all steam workshop requests
+
+    Connections to steamcommunity.com are kept alive and pooled,
+    so consecutive requests do not need a new TCP and TLS handshake.
+
+    :param pool_size: number of connections kept open, at least the number of concurrent requests
+    :return: requests session
+    """
+    session = requests.Session()
+    session.headers.update({"User-Agent": "WorkshopManager"})
+    session.mount("https://steamcommunity.com", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+    return session
 
 
 class SteamWorkshop:
+    _workers = 16
+    _session = steam_session(_workers)
+    _timeout = 30
+    _executor = ThreadPoolExecutor(max_workers=_workers)
+
     @classmethod
-    def get_dependencies(cls, modId, parent_dependencies=[]):
-        new = SteamWorkshop.details(modId)["require"]
+    def get_dependencies(cls, modId):
+        """Resolves all direct and indirect dependencies of a workshop item
+
+        The dependency tree is crawled level by level,
+        all workshop pages of one level are read concurrently.
+
+        :param modId: Workshop ID
+        :return: list of Workshop IDs
+        """
         list = []
-        for n in new:
-            if n not in parent_dependencies and n not in list:
-                list += [n]
-                temp = SteamWorkshop.get_dependencies(modId, list+parent_dependencies)
-                if temp is not []:
-                    list += temp
+        visited = {modId}
+        level = [modId]
+        while len(level) > 0:
+            found = []
+            for details in SteamWorkshop.details_many(level):
+                for n in details.get("require", []):
+                    if n not in visited:
+                        visited.add(n)
+                        found.append(n)
+            list.extend(found)
+            level = found
 
         return list
 
@@ -204,34 +435,66 @@ class SteamWorkshop:
         :param modId: Workshop ID
         :return: True/False
         """
-        details = SteamWorkshop.details(modId)
-        return "message" not in details.keys()
+        return "message" not in SteamWorkshop.details(modId).keys()
 
     @classmethod
-    def download(cls, modId, appid):
+    def download(cls, modId, appid, install_dir, login, while_running=None):
         """Uses steamcmd to download workshop items
 
-        :param modId: Workshop ID
+        The items are passed to steamcmd in a script file, so any number of items fits.
+        steamcmd writes to the terminal directly, so prompts like the Steam Guard code show at once.
+        while_running is called right after steamcmd has been started,
+        so that other work overlaps with the download.
+
+        :param modId: list of Workshop IDs
+        :param appid: steam application id
+        :param install_dir: steam installation directory
+        :param login: dictionary of steam username and password
+        :param while_running: function without arguments to call during the download (default None)
         :return: None
+        :raises ValueError: install_dir contains '"'
         """
-        install_dir = Params().get("install_dir")
-        login = Params().get("login")
-
-        mods = ['+workshop_download_item {} {} validate'.format(Params().get("appid"), m) for m in modId]
+        # steamcmd scripts have no escape for quotes, so such a path would break the script
+        if '"' in install_dir:
+            raise ValueError('The installation directory must not contain \'"\'.')
+
+        # every item is downloaded and validated only once, even if listed repeatedly
+        lines = ['force_install_dir "{}"'.format(install_dir)]
+        lines.extend('workshop_download_item {} {} validate'.format(appid, m) for m in dict.fromkeys(modId))
+        lines.append("quit")
+        with tempfile.NamedTemporaryFile("w", suffix=".steamcmd", delete=False) as script:
+            script.write("\n".join(lines) + "\n")
+
+        process = None
         try:
-            cmd = ['steamcmd', '+login', login.get("username"), login.get("password"), '+force_install_dir', install_dir]
-            for m in mods:
-                cmd.append(m)
-            cmd.append("+quit")
-            subprocess.run(cmd)
-
-        except FileNotFoundError:
-            print("Please install steamcmd first: https://duckduckgo.com/?q=install+steamcmd&t=ffsb&ia=web")
+            cmd = ['steamcmd', '+login', login.get("username"), login.get("password"), '+runscript', script.name]
+            try:
+                process = subprocess.Popen(cmd)
+            except FileNotFoundError:
+                print("Please install steamcmd first: https://duckduckgo.com/?q=install+steamcmd&t=ffsb&ia=web")
+
+            try:
+                if while_running is not None:
+                    while_running()
+            except BaseException:
+                # do not leave steamcmd running unsupervised
+                if process is not None:
+                    process.kill()
+                raise
+            finally:
+                if process is not None:
+                    process.wait()
+        finally:
+            os.remove(script.name)
 
-    @classmethod
-    def details(cls, modId):
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def details(modId):
         """Crawls the steam workshop for item information
 
+        Results are cached for the whole run, so a workshop page is not read again
+        however many mods depend on it. Use details.cache_clear() to force a fresh read.
+
         :param modId: Workshop ID
         :return: dictionary of mod information
         """
@@ -240,15 +503,23 @@ class SteamWorkshop:
         link = "https://steamcommunity.com/sharedfiles/filedetails/"
         data = {"id": modId}
 
-        data = urllib.parse.urlencode(data)
-        link = link + "?" + data
-        r = urllib.request.urlopen(link)
+        r = SteamWorkshop._session.get(link, params=data, timeout=SteamWorkshop._timeout)
+        r.raise_for_status()
 
-        html = r.read()
+        html = r.content
 
-        details.update(SteamWorkshop.__parse_filedetails(html.decode("utf-8")))
+        details.update(SteamWorkshop.__parse_filedetails(html))
         return details
 
+    @classmethod
+    def details_many(cls, modIds):
+        """Crawls the steam workshop for information about several items concurrently
+
+        :param modIds: list of Workshop IDs
+        :return: list of dictionaries of mod information in the order of modIds
+        """
+        return list(cls._executor.map(SteamWorkshop.details, modIds))
+
     @classmethod
     def search(cls, search_text, appid, sort="mostrecent"):
         """Searches the Steam Workshop for search_text and returns a list of Workshop IDs
@@ -257,20 +528,11 @@ class SteamWorkshop:
         :param sort: Steam sorting method (default "mostrecent")
         :return: list of Workshop IDs
         """
-        from bs4 import BeautifulSoup  # https://www.crummy.com/software/BeautifulSoup/bs4/doc/
-
         html = SteamWorkshop.__get_search_html(search_text, appid, sort=sort)
 
-        soup = BeautifulSoup(html, "html.parser")
-        tags = soup.find_all(href=re.compile("(filedetails/\?id)"))
-
-        workshop_ids = []
-        for x in tags:
-            link = x.get("href")
-            workshop_id = SteamWorkshop.__find_ids(link)[0]
-            if workshop_id not in workshop_ids:
-                workshop_ids += [workshop_id]
-        return workshop_ids
+        # ordered deduplication of all linked items, no need to build a document tree
+        workshop_ids = dict.fromkeys(_FILEDETAILS_ID_BYTES_RE.findall(html))
+        return [workshop_id.decode("ascii") for workshop_id in workshop_ids]
 
     @classmethod
     def __get_search_html(cls, search_text, appid, tags="", sort=""):
@@ -279,7 +541,7 @@ class SteamWorkshop:
         :param search_text:
         :param tags: steam workshop tags (default "Mod")
         :param sort: steam workshop sorting method (default "")
-        :return: html bytes array
+        :return: html bytes array, empty if the search failed
         """
         parameters = {}
         parameters.update({"appid": appid})
@@ -288,71 +550,83 @@ class SteamWorkshop:
         parameters.update({"browsesort": sort})
         parameters.update({"section": "readytouseitems"})
         if tags != "": parameters.update({"requiredtags[]": tags})
-        url = "http://steamcommunity.com/workshop/browse/"
+        url = "https://steamcommunity.com/workshop/browse/"
 
-        data = urllib.parse.urlencode(parameters)
-        url = url + "?" + data
-        print(url)
-        req = urllib.request.Request(url)
-        html = None
+        html = b""
         try:
-            r = urllib.request.urlopen(req)
-            html = r.read()
-        except urllib.error.URLError as e:
-            print(e.reason)
-        return html.decode("utf-8")
+            r = cls._session.get(url, params=parameters, timeout=cls._timeout)
+            print(r.url)
+            r.raise_for_status()
+            html = r.content
+        except requests.RequestException as e:
+            print(e)
+        return html
 
     @classmethod
-    def __find_ids(cls, s):
-        """Searches for steam Workshop IDs in string
+    def __find_id(cls, link):
+        """Reads the steam Workshop ID from a link to a workshop item
 
-        :param s: any string
-        :return: list of Workshop IDs
+        :param link: link to a filedetails page
+        :return: Workshop ID or None
         """
-        workshop_id = re.findall("\d{5,15}", s)
-        return workshop_id
+        match = _FILEDETAILS_ID_RE.search(link)
+        if match is None:
+            return None
+        return match.group(1)
 
     @classmethod
     def __parse_filedetails(cls, html):
         """Parses information from html bytes array
 
         :param html: html bytes array
-        :return: dictionary of workshop item information
+        :return: dictionary of workshop item information, size in bytes
         """
-        from bs4 import BeautifulSoup  # https://www.crummy.com/software/BeautifulSoup/bs4/doc/
-
         details = {}
-        soup = BeautifulSoup(html, "html.parser")
+        # libxml2 decodes the bytes itself, a parser must not be shared between the crawler threads
+        tree = lxml_html.fromstring(html, parser=lxml_html.HTMLParser(encoding="utf-8"))
 
         # Workshop error handling
-        message = soup.find(id="message")
-        if message is not None:
-            details["message"] = str(message.string)
+        message = _XP_MESSAGE(tree)
+        if len(message) > 0:
+            details["message"] = message[0].text_content().strip()
             return details
 
-        link = soup.find(href=re.compile("(filedetails/\?id)")).get("href")
-        details["id"] = SteamWorkshop.__find_ids(link)[0]
+        link = _XP_LINK(tree)[0]
+        details["id"] = SteamWorkshop.__find_id(link)
 
-        html_details = soup.find(id="mainContents")
-        details["name"] = html_details.find("div", "workshopItemTitle").string
+        html_details = _XP_CONTENTS(tree)[0]
+        details["name"] = _XP_TITLE(html_details)
 
-        if html_details.find(id="previewImageMain") is not None:
-            details["logo_url"] = html_details.find(id="previewImageMain").get("src")
-        if html_details.find(id="previewImage") is not None:
-            details["logo_url"] = html_details.find(id="previewImage").get("src")
+        for image in ("previewImageMain", "previewImage"):
+            src = _XP_PREVIEW(html_details, image=image)
+            if len(src) > 0:
+                details["logo_url"] = src[0]
 
-        items = html_details.find(id="RequiredItems")
-        items = str(items)
-        details["require"] = SteamWorkshop.__find_ids(items)
+        details["require"] = []
+        for link in _XP_REQUIRED(html_details):
+            workshop_id = SteamWorkshop.__find_id(link)
+            if workshop_id is not None:
+                details["require"].append(workshop_id)
 
-        details["size"] = html_details.find("div", "detailsStatRight").string
+        details["size"] = _XP_SIZE(html_details)
 
         for i in details.keys():
             if i != "require":
                 details[i] = str(details[i])
 
+        details["size"] = SteamWorkshop.__parse_size(details["size"])
         return details
 
+    @classmethod
+    def __parse_size(cls, string):
+        """Reads workshop item size from human readable string
+
+        :param string: file size, e.g. "1,234.5 MB"
+        :return: file size in bytes
+        """
+        number, unit = string.split(" ", 1)
+        return int(float(number.replace(",", "")) * _UNIT_BYTES[unit.lower()])
+
 
 def parser_args():
     """Parses user input via CLI and provides help
@@ -441,32 +715,26 @@ class CLI:
             if args.command is None:
                 return 1
             method_name = args.command
-        class_name = CLI
 
-        try:
-            method = getattr(class_name, method_name)
-        except AttributeError:
-            raise NotImplementedError(
-                "Class `{}` does not implement `{}`".format(class_name.__class__.__name__, method_name))
+        method = _COMMANDS.get(method_name)
+        if method is None:
+            return 1
         return method(args)
 
     @staticmethod
-    def processMods(m):
+    def processMods(mod):
         """For parallel processing of found mods
 
-        :param m: parsed mod
-        :return: None
+        :param mod: found Mod
+        :return: printable description of the mod
         """
-        mod = Mod(m)
-        print("", mod.str_one_line())
+        result = " " + mod.str_one_line()
         if len(mod.get_dependencies()) > 1:
-            names = ""
-            size = 0
-            for d in mod.get_dependencies():
-                d = Mod(d)
-                names += d.name+", "
-                size += d.size
-            print(" Dependencies: {:8.2f} MB   {}".format(size/pow(1024, 2), names[:-2]))
+            dependencies = Mod.load_or_fetch_many(mod.get_dependencies())
+            names = ", ".join(d.name for d in dependencies)
+            size = sum(d.size for d in dependencies)
+            result += "\n Dependencies: {:8.2f} MB   {}".format(size/_MB, names)
+        return result
 
     @staticmethod
     def search(args):
@@ -476,16 +744,16 @@ class CLI:
         :return: None
         """
         # fail early and gracefully
-        CLI.fail_on_missing_params(["appid"])
+        params = CLI.fail_on_missing_params(["appid"])
 
-        text = ""
-        for s in args.search_term:
-            text += s+" "
-        appid = Params().get("appid")
-        mods = SteamWorkshop.search(text, appid, args.sort)
+        text = " ".join(args.search_term)
+        appid = params.get("appid")
+        mods = Mod.load_or_fetch_many(SteamWorkshop.search(text, appid, args.sort))
 
-        print("Found {0} Mods:".format(len(mods)))
-        Parallel(n_jobs=len(mods), backend="threading")(delayed(CLI.processMods)(m) for m in mods)
+        out = ["Found {0} Mods:".format(len(mods))]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            out.extend(executor.map(CLI.processMods, mods))
+        CLI.print_lines(out)
 
     @staticmethod
     def set(args):
@@ -498,11 +766,14 @@ class CLI:
         :return: None
         """
         if args.var == "login":
-            Params().update({args.var: {"username": args.username, "password": args.password}})
+            Params.instance().update({args.var: {"username": args.username, "password": args.password}})
         if args.var == "install_dir":
-            Params().update({args.var: args.directory})
+            if '"' in args.directory:
+                print('The installation directory must not contain \'"\'.')
+                return
+            Params.instance().update({args.var: args.directory})
         if args.var == "appid":
-            Params().update({args.var: args.appid})
+            Params.instance().update({args.var: args.appid})
 
     @staticmethod
     def info(args):
@@ -514,7 +785,7 @@ class CLI:
         # fail early and gracefully
         CLI.fail_on_missing_params(["appid"])
 
-        mod = Mod(args.workshop_id)
+        mod = Mod.load_or_fetch(args.workshop_id)
         print(mod)
 
     @staticmethod
@@ -524,26 +795,32 @@ class CLI:
         :param args: parsed CLI arguments
         :return: None
         """
-        mods = Mods().values()
-        sizes = [m.size for m in mods]
-        dependencies = []
-        print("Installed:")
+        db = Mods.instance()
+        mods = db.values()
+        dependency_ids = []
+        listed = set()
+        out = ["Installed:"]
         for mod in mods:
             for m in mod.get_dependencies():
-                m = Mod(m)
-                if m not in dependencies and m not in mods:
-                    sizes += [m.size]
-                    dependencies += [m]
-            print("", mod.str_one_line())
+                if m not in listed and m not in db:
+                    listed.add(m)
+                    dependency_ids.append(m)
+            out.append(" " + mod.str_one_line())
+
+        # only dependencies which are not installed themselves need their workshop page
+        dependencies = Mod.fetch_many(dependency_ids)
+        size = sum(m.size for m in mods) + sum(m.size for m in dependencies)
 
-        print("Dependencies:")
+        out.append("Dependencies:")
         for m in dependencies:
-            print("", m.str_one_line())
+            out.append(" " + m.str_one_line())
 
-        print("\nSummary\n==============================")
-        print("{: >10} {: >12d} Workshop mod{}".format("Installed", len(sizes), "s" if len(sizes) != 1 else ""))
-        print("{: >10} {: >12.2f} MB".format("Size", sum(sizes) / pow(1024, 2)))
-        print("")
+        out.append("\nSummary\n==============================")
+        count = len(mods) + len(dependencies)
+        out.append("{: >10} {: >12d} Workshop mod{}".format("Installed", count, "s" if count != 1 else ""))
+        out.append("{: >10} {: >12.2f} MB".format("Size", size/_MB))
+        out.append("")
+        CLI.print_lines(out)
 
     @staticmethod
     def install(args):
@@ -553,65 +830,78 @@ class CLI:
         :return: None
         """
         # fail early and gracefully
-        CLI.fail_on_missing_params(["install_dir", "appid", "login"])
+        params = CLI.fail_on_missing_params(["install_dir", "appid", "login"])
 
-        # group mods
-        install = []
-        installed = []
-        not_found = []
-        for mod_id in args.workshop_ids:
-            if SteamWorkshop.exists(mod_id):
-                if mod_id not in Mods().keys():
-                    if mod_id not in install:
-                        install += [mod_id]
-                else:
-                    installed += [mod_id]
-            else:
-                not_found += [mod_id]
+        db = Mods.instance()
+        mods, dependencies, installed, not_found = CLI.resolve(args.workshop_ids, db)
+        install = [m.id for m in mods + dependencies]
+        size = sum(m.size for m in mods + dependencies)
 
-        sizes = []
-        mods = [Mod(mod) for mod in install]
-        mods_ids = [m.id for m in mods]
-        dependencies = []
-        if len(install) > 0:
-            print("Installing:")
-            for mod in mods:
-                sizes += [mod.size]
-                for m in mod.get_dependencies():
-                    if m not in Mods().keys():
-                        if m not in mods_ids:
-                            if m not in dependencies:
-                                dependencies += [m]
-                                install += [m]
-                print("", mod.str_one_line())
+        out = []
+        if len(mods) > 0:
+            out.append("Installing:")
+            out.extend(" " + mod.str_one_line() for mod in mods)
         if len(dependencies) > 0:
-            print("Installing dependencies:")
-            for m in dependencies:
-                mod = Mod(m)
-                sizes += [mod.size]
-                print("", mod.str_one_line())
+            out.append("Installing dependencies:")
+            out.extend(" " + mod.str_one_line() for mod in dependencies)
 
-        print("\nSummary\n==============================")
+        out.append("\nSummary\n==============================")
         if len(installed) > 0:
-            print("{: >10} {: >12d} Workshop mod{}".format("Existing", len(installed), "s" if len(installed) != 1 else ""))
+            out.append("{: >10} {: >12d} Workshop mod{}".format("Existing", len(installed), "s" if len(installed) != 1 else ""))
         if len(not_found) > 0:
-            print("{: >10} {: >12d} {}".format("Not Found", len(not_found), not_found))
-        print("{: >10} {: >12d} Workshop mod{}".format("Install", len(sizes), "s" if len(sizes) != 1 else ""))
-        print("{: >10} {: >12.2f} MB".format("Size", sum(sizes)/pow(1024,2)))
-        print("")
+            out.append("{: >10} {: >12d} {}".format("Not Found", len(not_found), not_found))
+        out.append("{: >10} {: >12d} Workshop mod{}".format("Install", len(install), "s" if len(install) != 1 else ""))
+        out.append("{: >10} {: >12.2f} MB".format("Size", size/_MB))
+        out.append("")
+        CLI.print_lines(out)
         if not args.yes:
             if "n" == input("Is this ok [Y|n]:").lower():
                 print("Installation aborted.")
                 return 0
 
-        for mod in mods:
-            Mods().install(mod)
-
-        SteamWorkshop.download(install, Params().get("appid"))
+        SteamWorkshop.download(install, params.get("appid"), params.get("install_dir"), params.get("login"),
+                               while_running=lambda: db.install_many(mods))
 
         if args.write_version:
+            store = Appworkshop(params.get("install_dir"), params.get("appid"))
             for mod_id in install:
-                Appworkshop().write_version(mod_id)
+                store.write_version(mod_id)
+
+    @staticmethod
+    def resolve(workshop_ids, db):
+        """Groups requested workshop items and resolves all of their missing dependencies
+
+        Every workshop page is read once and nothing is installed yet.
+
+        :param workshop_ids: list of requested Workshop IDs
+        :param db: installed mods
+        :return: tuple of lists: Mods and dependency Mods to install, installed and not found Workshop IDs
+        """
+        queued = set()
+        mods = []
+        installed = []
+        not_found = []
+        for mod_id, details in zip(workshop_ids, SteamWorkshop.details_many(workshop_ids)):
+            if "message" not in details.keys():
+                if mod_id not in db:
+                    if mod_id not in queued:
+                        queued.add(mod_id)
+                        mods.append(Mod(mod_id, details))
+                else:
+                    installed.append(mod_id)
+            else:
+                not_found.append(mod_id)
+
+        # resolve the dependency trees of all requested mods at the same time
+        dependencies = []
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for mod_dependencies in executor.map(Mod.get_dependencies, mods):
+                for m in mod_dependencies:
+                    if m not in db and m not in queued:
+                        queued.add(m)
+                        dependencies.append(m)
+
+        return mods, Mod.fetch_many(dependencies), installed, not_found
 
     @staticmethod
     def remove(args):
@@ -620,13 +910,14 @@ class CLI:
         :param args: parsed CLI arguments
         :return: None
         """
-        for m in args.workshop_ids:
-            if m not in Mods().keys():
-                print(m, "not installed.")
-            else:
-                mod = Mods().get(m)
-                Mods().pop(m)
-                print(mod.name, "removed.")
+        with Mods.instance() as db:
+            for m in args.workshop_ids:
+                if m not in db:
+                    print(m, "not installed.")
+                else:
+                    mod = db.get(m)
+                    db.pop(m)
+                    print(mod.name, "removed.")
 
     @staticmethod
     def update(args):
@@ -636,64 +927,113 @@ class CLI:
         :return: None
         """
         # fail early and gracefully
-        CLI.fail_on_missing_params(["install_dir", "appid", "login"])
+        params = CLI.fail_on_missing_params(["install_dir", "appid", "login"])
+
+        db = Mods.instance()
 
         install = []
         if args.workshop_ids[0] == "all":
-            mods = Mods().keys()
+            mods = db.keys()
         else:
             mods = []
             for mod_id in args.workshop_ids:
-                m = Mods().get(mod_id)
+                m = db.get(mod_id)
                 if type(m) is Mod:
-                    mods += [m.id]
-                    mods += [md for md in m.get_dependencies()]
+                    mods.append(m.id)
+                    mods.extend(m.get_dependencies())
 
+        queued = set()
         for mod in mods:
-            if mod not in Mods().keys():
+            if mod not in db:
                 print(mod, "not installed.")
-            elif mod in install:
+            elif mod in queued:
                 print(mod, "skipped, already updated.")
             else:
-                install += [mod]
+                queued.add(mod)
+                install.append(mod)
 
-        store = Appworkshop()
+        # one steamcmd session for all mods, unless each mod is explicitly updated on its own
         if args.individual:
-            for mod in install:
-                SteamWorkshop.download([mod], Params().get("appid"))
-                if args.write_version:
-                    store.write_version(mod)
+            batches = [[mod] for mod in install]
         else:
-            SteamWorkshop.download(install, Params().get("appid"))
-            for mod in install:
-                if args.write_version:
+            batches = [install]
+
+        # read the workshop pages of all updated mods again, their stored information is written once
+        with db, ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in executor.map(functools.partial(Mod.load_or_fetch, force=True), install):
+                pass
+
+        store = Appworkshop(params.get("install_dir"), params.get("appid")) if args.write_version else None
+        for batch in batches:
+            SteamWorkshop.download(batch, params.get("appid"), params.get("install_dir"), params.get("login"))
+            if store is not None:
+                store.reload()
+                for mod in batch:
                     store.write_version(mod)
 
+    @staticmethod
+    def print_lines(lines):
+        """Writes all lines of a command output to stdout at once
+
+        :param lines: list of strings without line break
+        :return: None
+        """
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
     @staticmethod
     def fail_on_missing_params(params):
+        """Exits with a hint if one of the given parameters has not been set or cannot be used
+
+        :param params: list of parameter names
+        :return: Params, all given parameters are set and usable
+        """
         message = {"install_dir": "Please set installation directory.",
                    "appid": "Please set steam app id.",
                    "login": "Please set steam login first."}
+        db = Params.instance()
         error = ""
         for p in params:
-            if p not in Params().keys():
+            if p not in db:
                 error += message[p]+"\n"
+        # steamcmd scripts cannot quote such a path, see SteamWorkshop.download
+        if "install_dir" in params and '"' in db.get("install_dir", ""):
+            error += 'The installation directory must not contain \'"\'.\n'
         if error != "":
             print(error)
             print("use: set --help")
             exit(0)
+        return db
+
+
+_COMMANDS = {"search": CLI.search,
+             "install": CLI.install,
+             "remove": CLI.remove,
+             "update": CLI.update,
+             "info": CLI.info,
+             "list": CLI.list,
+             "set": CLI.set}
 
 
 class Appworkshop:
-    def __init__(self):
+    def __init__(self, install_dir, appid):
+        self.install_dir = install_dir
+        self.appid = appid
         self.content = {}
+        self.file = self._find()
+        self.stamp = None
         self.reload()
 
     def reload(self):
-        self.content = self._load(self._find())
+        # the file is only parsed again once steamcmd has changed it;
+        # the size catches rewrites within one tick of a coarse filesystem clock
+        stat = os.stat(self.file)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self.stamp:
+            self.content = self._load(self.file)
+            self.stamp = stamp
 
     def export(self, modid):
-        self.reload()
         items = self.content["AppWorkshop"]["WorkshopItemsInstalled"]
         result = {}
         if modid in items.keys():
@@ -702,49 +1042,45 @@ class Appworkshop:
 
     def write_version(self, modid):
         mod = self.export(modid)
-        folder = glob.glob(Params().get("install_dir")+"/**/"+Params().get("appid")+"/"+modid, recursive=True)
-        self._delete_versions(folder[0])
-        file = folder[0]+"/"+mod["timeupdated"]+".ver"
+        folder = self._find_content(modid)
+        self._delete_versions(folder)
+        file = folder+"/"+mod["timeupdated"]+".ver"
         with open(file, "w+") as f:
             f.write("")
 
     @staticmethod
     def _parse_acf(content):
-        result = {}
-        nested = ""
-        collect_nested_dict = False
-        nested_count = 0
+        # one pass over all lines, the innermost open block is on top of the stack
+        stack = [{}]
         last = ""
 
         for line in content.splitlines():
             line = line.strip().replace("\"", "")
-            if collect_nested_dict:
-                nested += line + "\n"
-                if "{" in line:
-                    nested_count += 1
-                if "}" in line:
-                    nested_count -= 1
-                if nested_count < 0:
-                    result[last] = Appworkshop._parse_acf(nested)
-                    nested = ""
-                    nested_count = 0
-                    collect_nested_dict = False
-                continue
-            if "{" in line:
-                collect_nested_dict = True
-                continue
-
-            if "\t\t" in line:
+            if line == "{":
+                nested = {}
+                stack[-1][last] = nested
+                stack.append(nested)
+            elif line == "}":
+                if len(stack) > 1:
+                    stack.pop()
+            elif "\t\t" in line:
                 vars = line.split("\t\t")
-                result[vars[0]] = vars[1]
-
-            last = line
-        return result
-
-    @staticmethod
-    def _find():
-        root = Params().get("install_dir")
-        appid = Params().get("appid")
+                stack[-1][vars[0]] = vars[1]
+            else:
+                last = line
+        return stack[0]
+
+    def _workshop_dir(self):
+        # steamcmd places workshop items below the forced install directory
+        return pathlib.Path(self.install_dir, "steamapps", "workshop")
+
+    def _find(self):
+        root = self.install_dir
+        appid = self.appid
+        file = self._workshop_dir() / ("appworkshop_" + appid + ".acf")
+        if file.is_file():
+            return str(file)
+        # search the whole install directory only for non default layouts
         dir = root + "/**/appworkshop_" + appid + ".acf"
         files = glob.glob(dir, recursive=True)
         if len(files) != 1:
@@ -752,6 +1088,12 @@ class Appworkshop:
             exit(1)
         return files[0]
 
+    def _find_content(self, modid):
+        folder = self._workshop_dir() / "content" / self.appid / modid
+        if folder.is_dir():
+            return str(folder)
+        return glob.glob(self.install_dir+"/**/"+self.appid+"/"+modid, recursive=True)[0]
+
     @staticmethod
     def _load(file):
         with open(file) as f: